@@ -30,6 +30,9 @@ if typing.TYPE_CHECKING:
 # Constants for the restore_axis_on_toolchange variable.
 XYZ_TO_INDEX: dict[str, int] = {"x": 0, "X": 0, "y": 1, "Y": 1, "z": 2, "Z": 2}
 INDEX_TO_XYZ: dict[int, str] = {0: "X", 1: "Y", 2: "Z"}
+# Offset index with the position and adjust parameter names for offset_from_gcmd.
+_OFFSET_PARAMS: tuple[tuple[int, str, str], ...] = tuple(
+    (XYZ_TO_INDEX[axis], axis, axis + "_ADJUST") for axis in ("X", "Y", "Z"))
 DEFAULT_WAIT_FOR_TEMPERATURE_TOLERANCE = 1  # Default tolerance in degC.
 # Don't wait for temperatures below this because they might be ambient.
 LOWEST_ALLOWED_TEMPERATURE_TO_WAIT_FOR = 40
@@ -72,6 +75,8 @@ class Ktc(KtcBaseClass, KtcConstantsClass):
         self._tools_having_tc: typing.Dict[
             "ktc_tool.KtcTool", "ktc_toolchanger.KtcToolchanger"
         ] = {}
+        # All tools ordered from the deepest toolchanger up. Built on first traversal.
+        self._tools_from_deepest: typing.Optional[list["ktc_tool.KtcTool"]] = None
         self.all_heaters: dict[str, "ktc_heater.KtcHeater"] = {}
 
         self.__active_tool = self.TOOL_UNKNOWN  # The currently active tool.
@@ -265,6 +270,7 @@ class Ktc(KtcBaseClass, KtcConstantsClass):
 
         for tool in (self.TOOL_NONE, self.TOOL_UNKNOWN):
             self.all_tools[tool.name] = tool
+        self._tools_from_deepest = None
 
     def _register_tool_gcode_commands(self):
         """Register Gcode commands for all tools having a number."""
@@ -389,7 +395,7 @@ class Ktc(KtcBaseClass, KtcConstantsClass):
         try:
             tool = self.get_tool_from_gcmd(gcmd)
             toolchanger = self.get_toolchanger_from_gcmd(gcmd)
-            if tool.name not in toolchanger.tools and tool not in self.INVALID_TOOLS:
+            if tool.name not in toolchanger.tools and id(tool) not in self.INVALID_TOOL_IDS:
                 raise self.printer.command_error(
                     "Tool %s not found in toolchanger %s." % (tool.name, toolchanger.name)
                 )
@@ -530,7 +536,7 @@ class Ktc(KtcBaseClass, KtcConstantsClass):
             # Traverse all tools and deselect them from the deepest towards the top.
             def deselect(tool: "ktc_tool.KtcTool"):
                 if (
-                    tool not in self.INVALID_TOOLS
+                    id(tool) not in self.INVALID_TOOL_IDS
                     and tool.state == self.StateType.SELECTED
                 ):
                     tool.deselect()
@@ -809,14 +815,17 @@ class Ktc(KtcBaseClass, KtcConstantsClass):
                 f"Failing to resume all heaters: {str(e)}"
             ) from e
 
-    def offset_from_gcmd(self, gcmd: "gcode.GCodeCommand", offset: list) -> list[float]:
-        for axis in ("X", "Y", "Z"):
-            pos = gcmd.get_float(axis, None)
-            adjust = gcmd.get_float(axis + "_ADJUST", None)
+    def offset_from_gcmd(
+        self, gcmd: "gcode.GCodeCommand", offset: typing.Sequence[float]) -> list[float]:
+        offset = list(offset)   # Never change the passed offset in place.
+        for index, pos_param, adjust_param in _OFFSET_PARAMS:
+            pos = gcmd.get_float(pos_param, None)
             if pos is not None:
-                offset[XYZ_TO_INDEX[axis]] = pos
-            elif adjust is not None:
-                offset[XYZ_TO_INDEX[axis]] += adjust
+                offset[index] = pos
+                continue
+            adjust = gcmd.get_float(adjust_param, None)
+            if adjust is not None:
+                offset[index] += adjust
         return offset
 
     cmd_KTC_TOOL_OFFSET_SAVE_help = (
@@ -927,7 +936,7 @@ class Ktc(KtcBaseClass, KtcConstantsClass):
 
             return False
 
-        if tool in self.INVALID_TOOLS:
+        if id(tool) in self.INVALID_TOOL_IDS:
             raise ValueError("Tool is TOOL_NONE or TOOL_UNKNOWN")
         if self.state == self.StateType.ERROR:
             raise ValueError("KTC is in error state")
@@ -959,10 +968,10 @@ class Ktc(KtcBaseClass, KtcConstantsClass):
         elif explicit:
             return None # type: ignore
         else:
-            if self.active_tool in self.INVALID_TOOLS:
+            if id(self.active_tool) in self.INVALID_TOOL_IDS:
                 raise gcmd.error("No tool specified and no active tool")
             tool = self.active_tool
-        if not allow_invalid_active_tool and tool in self.INVALID_TOOLS:
+        if not allow_invalid_active_tool and id(tool) in self.INVALID_TOOL_IDS:
             raise gcmd.error(f"Tool {tool.name} not allowed.")
         return tool  # type: ignore
 
@@ -992,25 +1001,28 @@ class Ktc(KtcBaseClass, KtcConstantsClass):
         return toolchanger
 
     def traverse_tools_from_deepest(self, func):
-        def _get_nested_tools(self: Ktc, toolchanger: "ktc_toolchanger.KtcToolchanger"):
-            nested_tools = []
-            for tool in toolchanger.tools.values():
-                if tool in self._tools_having_tc:
-                    nested_tools.append(
-                        _get_nested_tools(self, self._tools_having_tc[tool])
-                    )
-                nested_tools.append(tool)
-            return nested_tools
-
-        def _recursive_traverse_tools(self: Ktc, item, func):
-            if isinstance(item, list):
-                for i in item:
-                    _recursive_traverse_tools(self, i, func)
-            else:
-                func(item)
+        """Run func for all tools, tools on nested toolchangers before their parent tool."""
+        if self._tools_from_deepest is None:
+            ordered: list["ktc_tool.KtcTool"] = []
+            # Stack of (remaining tools on a toolchanger, parent tool of that toolchanger).
+            stack: list[tuple[typing.Iterator["ktc_tool.KtcTool"],
+                              typing.Optional["ktc_tool.KtcTool"]]] = [
+                (iter(self.default_toolchanger.tools.values()), None)]
+            while stack:
+                tools, parent_tool = stack[-1]
+                tool = next(tools, None)
+                if tool is None:
+                    stack.pop()
+                    if parent_tool is not None:
+                        ordered.append(parent_tool)
+                elif tool in self._tools_having_tc:
+                    stack.append((iter(self._tools_having_tc[tool].tools.values()), tool))
+                else:
+                    ordered.append(tool)
+            self._tools_from_deepest = ordered
 
-        nested_tools = _get_nested_tools(self, self.default_toolchanger)
-        _recursive_traverse_tools(self, nested_tools, func)
+        for tool in self._tools_from_deepest:
+            func(tool)
 
     @staticmethod
     def tool_fan_speed_set(tool: "ktc_tool.KtcTool", speed: float):
@@ -1060,7 +1072,7 @@ class Ktc(KtcBaseClass, KtcConstantsClass):
     ):  # pylint: disable=invalid-name, unused-argument
         self.log.always("KTC Debugging Heaters:")
         for tool in self.all_tools.values():
-            if tool in self.INVALID_TOOLS:
+            if id(tool) in self.INVALID_TOOL_IDS:
                 continue
             active_time = self.log.tool_stats[tool.name].start_time_heater_active
             standby_time = self.log.tool_stats[tool.name].start_time_heater_standby
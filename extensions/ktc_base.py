@@ -8,8 +8,7 @@
 # This file may be distributed under the terms of the GNU GPLv3 license.
 #
 from __future__ import annotations
-import ast, typing, re
-import cProfile, pstats, io
+import ast, typing, re, functools
 from enum import IntEnum, Enum
 from .ktc_heater import (   # pylint: disable=relative-beyond-top-level
     KtcToolExtruder,
@@ -29,23 +28,32 @@ TOOL_NUMBERLESS_N = -3
 TOOL_UNKNOWN_N = -2
 TOOL_NONE_N = -1
 
-# Parameters available for inheritance by all tools and their default values.
-PARAMS_TO_INHERIT = {"_engage_gcode": "",
-                     "_disengage_gcode": "",
-                     "_init_gcode": "",
-                     "_tool_select_gcode": "",
-                     "_tool_deselect_gcode": "",
-                     "force_deselect_when_parent_deselects": True,
-                     "parent_must_be_selected_on_deselect": True,
-                     "_heaters_config": "",
-                     "fans": "",
-                     "offset": [0.0, 0.0, 0.0],
-                     "requires_axis_homed": "XYZ",
-                     "_heater_active_to_standby_delay_in_config":
-                         DEFAULT_HEATER_ACTIVE_TO_STANDBY_DELAY,
-                     "_heater_standby_to_powerdown_delay_in_config":
-                         DEFAULT_HEATER_STANDBY_TO_POWERDOWN_DELAY,
-                     }
+# Parameters available for inheritance by all tools.
+# The default values are class attributes on KtcBaseClass.
+PARAMS_TO_INHERIT = ("_engage_gcode",
+                     "_disengage_gcode",
+                     "_init_gcode",
+                     "_tool_select_gcode",
+                     "_tool_deselect_gcode",
+                     "force_deselect_when_parent_deselects",
+                     "parent_must_be_selected_on_deselect",
+                     "_heaters_config",
+                     "fans",
+                     "offset",
+                     "requires_axis_homed",
+                     "_heater_active_to_standby_delay_in_config",
+                     "_heater_standby_to_powerdown_delay_in_config",
+                     )
+
+# Patterns used to detect the type of params_ options.
+_FLOAT_PATTERN = r"-?(?:\d+\.\d*|\.\d+)"
+_INT_RE = re.compile(r"-?\d+")
+_FLOAT_RE = re.compile(_FLOAT_PATTERN)
+_INT_LIST_RE = re.compile(r"-?\d+(?:\s*,\s*-?\d+)+")
+_FLOAT_LIST_RE = re.compile(
+    rf"(?:-?\d+|{_FLOAT_PATTERN})(?:\s*,\s*(?:-?\d+|{_FLOAT_PATTERN}))+")
+# Values made only of digits, ".", "-", "," and spaces are meant as numbers.
+_NUMERIC_CHARS_RE = re.compile(r"[-\d., ]*\d[-\d., ]*")
 
 class KtcConfigurableEnum(Enum):
     @classmethod
@@ -55,21 +63,46 @@ class KtcConfigurableEnum(Enum):
         val = val.strip().upper()
         if val == "":
             raise ValueError(f"Value {value_name} not found in configuration.")
-        if val not in cls.list_valid_values():
+        if val not in cls._valid_values_set():
             raise ValueError(f"Value {val} not valid for {value_name}"
                                 +f" in configuration for {config.get_name()}."
                 + f"Valid values are: {cls.list_valid_values()}")
         return cls[val]
 
     @classmethod
+    @functools.lru_cache(maxsize=None)
     def list_valid_values(cls):
         return [str(name) for name in cls.__members__]
 
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _valid_values_set(cls) -> frozenset:
+        return frozenset(cls.__members__)
+
     def __str__(self):
         return f"'{self.name}'"
 
 class KtcBaseClass:
     """Base class for KTC. Contains common methods and properties."""
+
+    # Default values for the inheritable parameters in PARAMS_TO_INHERIT. Instances only
+    # hold their own value when it is configured or inherited, see configure_inherited_params.
+    _engage_gcode: str = ""
+    _disengage_gcode: str = ""
+    _init_gcode: str = ""
+    _tool_select_gcode: str = ""
+    _tool_deselect_gcode: str = ""
+    force_deselect_when_parent_deselects: bool = True
+    parent_must_be_selected_on_deselect: bool = True
+    _heaters_config: str = ""
+    fans: typing.Sequence = ()
+    # Immutable so it can't be changed in place. Copied to a list in configure_inherited_params.
+    offset: typing.Sequence[float] = (0.0, 0.0, 0.0)
+    requires_axis_homed: str = "XYZ"
+    _heater_active_to_standby_delay_in_config: float = DEFAULT_HEATER_ACTIVE_TO_STANDBY_DELAY
+    _heater_standby_to_powerdown_delay_in_config: float = (
+        DEFAULT_HEATER_STANDBY_TO_POWERDOWN_DELAY)
+
     def __init__(self, config: "configfile.ConfigWrapper"): # type: ignore
         self.config = typing.cast('configfile.ConfigWrapper', config)
         self.name: str = ""
@@ -79,22 +112,16 @@ class KtcBaseClass:
 
         self.debug_with_profile: bool = False
 
-        # Can contain "X", "Y", "Z" or a combination.
-        self.requires_axis_homed: str = ""
-        self._state = self.StateType.NOT_CONFIGURED
+        # Section name in the persistent state. Set on first use.
+        self._persistent_type_key: str = None    # type: ignore
 
-        self.force_deselect_when_parent_deselects: bool = None  # type: ignore
-        self.parent_must_be_selected_on_deselect: bool = None  # type: ignore
+        self._state = self.StateType.NOT_CONFIGURED
 
         # If this is a empty object then don't load the config.
         if config is None:
             return
 
-        self.force_deselect_when_parent_deselects: bool = config.getboolean(
-            "force_deselect_when_parent_deselects", None)  # type: ignore
-
-        self.parent_must_be_selected_on_deselect: bool = config.getboolean(
-            "parent_must_be_selected_on_deselect", None)  # type: ignore
+        section_name = config.get_name()
 
         self.printer : 'klippy.Printer' = config.get_printer()
         self.reactor: 'klippy.reactor.Reactor' = self.printer.get_reactor()
@@ -103,53 +130,55 @@ class KtcBaseClass:
         self._ktc: 'ktc.Ktc' = None # type: ignore # We are loading it later.
 
         self._state = self.StateType.NOT_CONFIGURED
-        self.offset: list[float, float, float] = None   # type: ignore
 
         self.params = self.get_params_dict_from_config(config)
         # Get inheritable parameters from the config.
-        # Empty strings are NOT overwritten by the parent object in configure_inherited_params.
-        # Must be set to None as standard.
-        # Initalized to default values in KTC as topmost parent.
-        self._engage_gcode = config.get("engage_gcode", None)  # type: ignore
-        self._disengage_gcode = config.get("disengage_gcode", None)  # type: ignore
-        self._init_gcode = config.get("init_gcode", None)  # type: ignore
-        self._tool_select_gcode = config.get("tool_select_gcode", None)     # type: ignore
-        self._tool_deselect_gcode = config.get("tool_deselect_gcode", None) # type: ignore
-
-        self._heaters_config: str = self.config.get("heater", None)    # type: ignore
+        # Parameters not in the config are left unset on the instance and are inherited
+        # from the parent object in configure_inherited_params. If no parent sets them,
+        # the class defaults on KtcBaseClass are used.
+        # Empty strings are NOT overwritten by the parent object.
+        set_param = self._set_inheritable_param
+        set_param("force_deselect_when_parent_deselects",
+                  config.getboolean("force_deselect_when_parent_deselects", None))
+        set_param("parent_must_be_selected_on_deselect",
+                  config.getboolean("parent_must_be_selected_on_deselect", None))
+        set_param("_engage_gcode", config.get("engage_gcode", None))
+        set_param("_disengage_gcode", config.get("disengage_gcode", None))
+        set_param("_init_gcode", config.get("init_gcode", None))
+        set_param("_tool_select_gcode", config.get("tool_select_gcode", None))
+        set_param("_tool_deselect_gcode", config.get("tool_deselect_gcode", None))
+
+        set_param("_heaters_config", config.get("heater", None))
 
         # Minimum time is 0.1 seconds. 0 disables the timer thus never changes the temperature.
-        self._heater_active_to_standby_delay_in_config = self.config.getfloat(
-            "heater_active_to_standby_delay", None, 0.1)    # type: ignore
-        self._heater_standby_to_powerdown_delay_in_config = self.config.getfloat(
-            "heater_standby_to_powerdown_delay", None, 0.1) # type: ignore
+        set_param("_heater_active_to_standby_delay_in_config",
+                  config.getfloat("heater_active_to_standby_delay", None, 0.1))
+        set_param("_heater_standby_to_powerdown_delay_in_config",
+                  config.getfloat("heater_standby_to_powerdown_delay", None, 0.1))
 
         # Fans are a list of lists with the first value being the name
         # of the fan and the second value being the speed scaling 0-1.
         f = typing.cast(str, self.config.get("fans", "")).replace(" ", "")
-        self.fans = [x.split(":") for x in f.split(",")] if f != "" else []
-        fan: list[typing.Any]
-        for fan in self.fans:
-            errmsg = ("Invalid fan speed scaling for" +
-                      f" {self.config.get_name()}: {fan[0]}. " +
-                      "Fan speed must be a float between 0 and 1.")
-            if len(fan) == 1:
-                fan.append(1.0)
-            elif not self.is_float(fan[1]):
-                raise config.error(errmsg)
-            else:
-                if fan[1] is not None:
-                    fan[1] = fan[1]
-            if fan[1] < 0 or fan[1] > 1:
-                raise config.error(errmsg)
-            if len(fan) != 2:
-                raise config.error(f"Fan settings for {self.config.get_name()} are invalid.")
+        self.fans = []
+        for fan in f.split(",") if f != "" else []:
+            name, *scaling = fan.split(":")
+            if len(scaling) > 1:
+                raise config.error(f"Fan settings for {section_name} are invalid.")
+            try:
+                speed = float(scaling[0]) if scaling else 1.0
+            except ValueError:
+                speed = -1.0    # Reported as out of range below.
+            if not 0 <= speed <= 1:
+                raise config.error("Invalid fan speed scaling for" +
+                                   f" {section_name}: {name}. " +
+                                   "Fan speed must be a float between 0 and 1.")
+            self.fans.append([name, speed])
 
         # requires_axis_homed can contain "X", "Y", "Z" or a combination. Remove all other.
-        self.requires_axis_homed: str = self.config.get(
-            "requires_axis_homed", None)   # type: ignore
-        if self.requires_axis_homed is not None and self.requires_axis_homed != "":
-            self.requires_axis_homed = re.sub(r'[^XYZ]', '', self.requires_axis_homed.upper())
+        requires_axis_homed: str = config.get("requires_axis_homed", None)  # type: ignore
+        if requires_axis_homed:
+            requires_axis_homed = re.sub(r'[^XYZ]', '', requires_axis_homed.upper())
+        set_param("requires_axis_homed", requires_axis_homed)
 
         # Initiating values are only red once and then saved to the persistent state and
         # must be removed from the config file to continue.
@@ -157,7 +186,7 @@ class KtcBaseClass:
         # Offset as a list of 3 floats. Also valid for global_offset.
         init: str = ""
         # Check first if the section exists in the configuration, get_prefix_options will fail otherwise.
-        if config.has_section(config.get_name()):
+        if config.has_section(section_name):
             for init in config.get_prefix_options("init_"):
                 init = init.strip().lower()
                 if 'offset' in init:
@@ -168,15 +197,20 @@ class KtcBaseClass:
                         elif init != "init_global_offset" or init == "init_offset":
                             raise ValueError(
                                 f"Invalid initializing option name {init} "
-                                + "for {self.config.get_name()}.")
+                                + f"for {section_name}.")
                         v = typing.cast(str, config.get(init)).replace(" ", "")
                         if v:
                             vl = [float(x) for x in v.split(",")]
                             if len(vl) != 3:
                                 raise ValueError(f"{init} must be a list of 3 floats.")
-                            self._initiating_config[init.lstrip("init_")] = vl
+                            self._initiating_config[init[5:]] = vl  # Strip "init_".
                     except Exception as e:
-                        raise self.config.error(f"Invalid {init} for {self.config.get_name()}: {e}")
+                        raise self.config.error(f"Invalid {init} for {section_name}: {e}")
+
+    def _set_inheritable_param(self, attr: str, value: typing.Any):
+        '''Set an inheritable parameter on the instance if it is configured.'''
+        if value is not None:
+            setattr(self, attr, value)
 
     def configure_inherited_params(self):
         '''Load inherited parameters from instances that this instance inherits from.
@@ -206,6 +240,8 @@ class KtcBaseClass:
         self._ktc = typing.cast('ktc.Ktc', self.printer.lookup_object("ktc"))
         self.log = typing.cast('ktc_log.KtcLog', self.printer.lookup_object(
             "ktc_log"))  # Load the log object.
+        # Only the ktc object reads debug_with_profile from the config.
+        self.debug_with_profile = self._ktc.debug_with_profile
 
         if self.debug_init_profile is not None:
             self.log.trace("KTC startup profile: " + str(self.debug_init_profile))
@@ -213,7 +249,7 @@ class KtcBaseClass:
         self.state = self.StateType.CONFIGURING
 
         # Get Offset from persistent storage
-        self.offset = self.persistent_state.get("offset", None)
+        self._set_inheritable_param("offset", self.persistent_state.get("offset", None))
 
         #  Set the parent object
         if isinstance(self, KtcBaseToolClass):
@@ -229,19 +265,22 @@ class KtcBaseClass:
 
         if self != parent:
             # Set the parameters from the parent object if they are not set.
-            for attr, _ in PARAMS_TO_INHERIT.items():
-                if getattr(self, attr) is None:
-                    setattr(self, attr, getattr(parent, attr))
+            # These are plain instance attributes so the dicts are used directly.
+            # Parameters the parent doesn't have fall back to the class defaults.
+            self_d = self.__dict__
+            parent_d = parent.__dict__
+            for attr in PARAMS_TO_INHERIT:
+                if self_d.get(attr) is None and attr in parent_d:
+                    self_d[attr] = parent_d[attr]
         else:
-            # For top ktc object initialize unused parameters.
-            for attr, default_value in PARAMS_TO_INHERIT.items():
-                if getattr(self, attr) is None:
-                    setattr(self, attr, default_value)
-
+            # The top ktc object uses the class defaults for unset parameters.
             for v in parent.params: # type: ignore
                 if v not in self.params:
                     self.params[v] = parent.params[v]   # type: ignore
 
+        # The offset list is changed in place so don't share it with the parent or default.
+        self.offset = list(self.offset)
+
     @staticmethod
     def get_params_dict_from_config(config: 'configfile.ConfigWrapper'):
         """Get a dict of atributes starting with params_ from the config."""
@@ -251,31 +290,40 @@ class KtcBaseClass:
             return result
 
         # Get all options that start with "params_" and add them to the result dict.
+        # The value is only read once, the type is known from the patterns below.
+        config_get = config.get
         for option in config.get_prefix_options("params_"):
             try:
-                value : str = config.get(option)
+                value : str = config_get(option)
+                stripped = value.strip()
+                lowered = stripped.lower()
                 # Boolean:
-                if value.lower().strip() in ("true", "false"):
-                    result[option] = config.getboolean(option)
+                if lowered in ("true", "false"):
+                    result[option] = lowered == "true"
                 # Integer:
-                elif value.replace("-", "").replace(" ", "").isdigit():
-                    result[option] = config.getint(option)
+                elif _INT_RE.fullmatch(stripped):
+                    result[option] = int(stripped)
                 # Float:
-                elif value.replace(".", "").replace("-", "").replace(" ", "").isdigit():
-                    result[option] = config.getfloat(option)
+                elif _FLOAT_RE.fullmatch(stripped):
+                    result[option] = float(stripped)
                 # List of Integers:
-                elif value.replace("-", "").replace(" ", "").replace(",", "").isdigit():
-                    result[option] = [int(x) for x in value.split(",")]
+                elif _INT_LIST_RE.fullmatch(stripped):
+                    result[option] = [int(x) for x in stripped.split(",")]
                 # List of Floats:
-                elif value.replace(".", "").replace("-", "").replace(
-                    " ", "").replace(",", "").isdigit():
-                    result[option] = [float(x) for x in value.split(",")]
+                elif _FLOAT_LIST_RE.fullmatch(stripped):
+                    result[option] = [float(x) for x in stripped.split(",")]
+                # Malformed number or list of numbers:
+                elif _NUMERIC_CHARS_RE.fullmatch(stripped):
+                    raise ValueError(f"'{stripped}' is not a valid number or list of numbers")
                 # String with quotes:
                 elif value.startswith('"') and value.endswith('"'):
                     result[option] = ast.literal_eval(value)
                 # String with single quotes:
                 elif value.startswith("'") and value.endswith("'"):
                     result[option] = ast.literal_eval(value)
+                # Plain string without quotes or escapes:
+                elif '\\' not in value and '"' not in value and "'" not in value:
+                    result[option] = value
                 # Check if it is a valid String:
                 else:
                     result[option] = ast.literal_eval('"' + value + '"')
@@ -306,22 +354,28 @@ class KtcBaseClass:
         SELECTED = 5            # Tool is selected.
         ACTIVE = 10             # Tool is active as main engaged tool for ktc.
 
-        @classmethod
-        def list_valid_values(cls):
-            return [name for name, _ in cls.__members__]
-
         def __str__(self):
             return f'{self.name}'
 
+    # State names, including aliases, to StateType members for the state setter.
+    _STATE_LOOKUP: dict[str, StateType] = dict(StateType.__members__)
+
     @property
     def state(self):
         return self._state
     @state.setter
     def state(self, value):
+        # Internal state changes pass StateType members, no conversion needed.
+        if value.__class__ is self.StateType:
+            self._state = value
+            return
         try:
-            self._state = self.StateType[str(value).upper()]
-        except KeyError as e:
-            raise ValueError("Invalid state value: " + str(value)) from e
+            self._state = self._STATE_LOOKUP[value]
+        except KeyError:
+            try:
+                self._state = self.StateType[str(value).upper()]
+            except KeyError as e:
+                raise ValueError("Invalid state value: " + str(value)) from e
 
 
     @property
@@ -347,14 +401,19 @@ class KtcBaseClass:
             self._ktc_persistent: 'ktc_persisting.KtcPersisting' = (  # type: ignore # pylint: disable=attribute-defined-outside-init
                 self.printer.lookup_object("ktc_persisting")
             )
+        if self._persistent_type_key is not None:
+            return self._persistent_type_key
+
         if isinstance(self, KtcBaseToolClass):
-            return "ktc_tool_" + self.name.lower()
+            key = "ktc_tool_" + self.name.lower()
         elif isinstance(self, KtcBaseChangerClass):
-            return "ktc_toolchanger_" + self.name.lower()
+            key = "ktc_toolchanger_" + self.name.lower()
         elif isinstance(self, KtcBaseClass):
-            return "ktc"
+            key = "ktc"
         else:
             raise ValueError(f"Can't get persistent state for object: {type(self)}")
+        self._persistent_type_key = key
+        return key
 
     @staticmethod
     def is_float(value: str) -> bool:
@@ -372,12 +431,13 @@ class KtcBaseClass:
 
     def run_with_profile(self, method, *args, **kwargs):
         '''Run a profile on a method. Used for debugging.'''
-        if not self.run_with_profile:
-            method(*args, **kwargs)
-            return
+        if not self.debug_with_profile:
+            return method(*args, **kwargs)
+        # Only needed when profiling so not imported at module level.
+        import cProfile, pstats, io  # pylint: disable=import-outside-toplevel
         pr = cProfile.Profile()
         pr.enable()
-        method(*args, **kwargs)
+        result = method(*args, **kwargs)
         pr.disable()
         s = io.StringIO()
         ps = pstats.Stats(pr, stream=s).sort_stats('cumulative')
@@ -397,6 +457,7 @@ class KtcBaseClass:
 
         self.log.trace(
             f"Performance profile for {method.__name__}:\n" + stats_string[:index])
+        return result
 
 class KtcBaseChangerClass(KtcBaseClass):
     '''Base class for toolchangers. Contains common methods and properties.'''
@@ -412,12 +473,21 @@ class KtcBaseChangerClass(KtcBaseClass):
 
 class KtcBaseToolClass(KtcBaseClass):
     '''Base class for tools. Contains common methods and properties.'''
+    # Tool states bound once for identity checks on the select and deselect paths.
+    _ST_SELECTING = KtcBaseClass.StateType.SELECTING
+    _ST_SELECTED = KtcBaseClass.StateType.SELECTED
+    _ST_ACTIVE = KtcBaseClass.StateType.ACTIVE
+    _ST_DESELECTING = KtcBaseClass.StateType.DESELECTING
+    _ST_ERROR = KtcBaseClass.StateType.ERROR
+
     def __init__(self, config: "configfile.ConfigWrapper",
                  name: str = "", number: int = TOOL_NUMBERLESS_N):
         super().__init__(config)
 
         self.name = name        # Override the name in case it is supplied.
         self.number = number
+        # True only for TOOL_UNKNOWN and TOOL_NONE.
+        self._is_invalid_tool = False
         # Is overridden by the tool object.
         self._toolchanger: 'ktc_toolchanger.KtcToolchanger' = None   # type: ignore
         self.toolchanger: 'ktc_toolchanger.KtcToolchanger' = self._toolchanger # type: ignore
@@ -430,7 +500,7 @@ class KtcBaseToolClass(KtcBaseClass):
         super(KtcBaseToolClass, type(self)).state.fset(self, value) # type: ignore
 
         # TOOL_UNKNOWN and TOOL_NONE has no _ktc object.
-        if self in KtcConstantsClass.INVALID_TOOLS:
+        if self._is_invalid_tool:
             return
 
         if self._ktc.propagate_state:
@@ -469,4 +539,7 @@ class KtcConstantsClass:
                          number=TOOL_NONE_N,
                          config = None))         # type: ignore
     TOOL_NONE._state = TOOL_UNKNOWN._state = KtcBaseClass.StateType.CONFIGURED  # pylint: disable=protected-access
+    TOOL_NONE._is_invalid_tool = TOOL_UNKNOWN._is_invalid_tool = True  # pylint: disable=protected-access
     INVALID_TOOLS = (TOOL_UNKNOWN, TOOL_NONE, None)
+    # Object ids of INVALID_TOOLS for constant time membership tests by identity.
+    INVALID_TOOL_IDS = frozenset(id(tool) for tool in INVALID_TOOLS)
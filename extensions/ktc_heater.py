@@ -53,6 +53,7 @@ class HeaterTimerType(IntEnum):
 # @dataclasses_json.dataclass_json
 @dataclasses.dataclass
 class KtcHeaterSettings:
+    __slots__ = ("name", "temperature_offset")
     name: str
     temperature_offset: float
 
@@ -81,6 +82,17 @@ class KtcHeaterSettings:
 
 
 class KtcToolExtruder:
+    __slots__ = (
+        "_tool",
+        "_state",
+        "_active_temp",
+        "_standby_temp",
+        "_active_to_standby_delay",
+        "_standby_to_powerdown_delay",
+        "heaters",
+        "_ktc",
+    )
+
     def __init__(self, tool: "ktc_tool.KtcTool"):
         self._tool = tool
         self._state = HeaterStateType.OFF
@@ -104,19 +116,22 @@ class KtcToolExtruder:
     @state.setter
     def state(self, value: HeaterStateType):
         self._state = value
-        _ktc = self._tool._ktc
-        self._tool._ktc.log.trace(
+        tool = self._tool
+        ktc = tool._ktc
+        all_heaters = ktc.all_heaters
+        log = ktc.log
+        log.trace(
             f"In extr. Setting heater state to {value} "
-            + f"for tool {self._tool.name}"
+            + f"for tool {tool.name}"
         )
 
         def set_heater_options(self: KtcToolExtruder, heater_settings: KtcHeaterSettings):
-            heater: KtcHeater = self._tool._ktc.all_heaters[heater_settings.name]
+            heater: KtcHeater = all_heaters[heater_settings.name]
             heater.heater_active_temp = heater_settings.temperature_offset + self.active_temp
             heater.standby_temp = heater_settings.temperature_offset + self.standby_temp
             heater.active_to_standby_delay = self.active_to_standby_delay
             heater.standby_to_powerdown_delay = self.standby_to_powerdown_delay
-            self._tool._ktc.log.trace(
+            log.trace(
                 f"Setting heater options for heater {heater.name} "
                 + f"{heater.heater_active_temp=}, {heater.standby_temp=}, "
                 + f"{heater.active_to_standby_delay= }, {heater.standby_to_powerdown_delay= }"
@@ -124,46 +139,46 @@ class KtcToolExtruder:
 
         # Allways set active state on all heaters
         if value == HeaterStateType.ACTIVE:
-            self._tool._ktc.log.trace(
+            log.trace(
                 "In extr. Setting heater state to ACTIVE "
-                + f"for tool {self._tool.name}"
+                + f"for tool {tool.name}"
                 + f" with active_temp {self._active_temp}"
             )
             for hs in self.heaters:
                 set_heater_options(self, hs)
-                self._tool._ktc.all_heaters[hs.name].state = value
-            self._tool._ktc.log.track_heater_active_start(self._tool)
+                all_heaters[hs.name].state = value
+            log.track_heater_active_start(tool)
             return
 
         # For STANDY and OFF, check if the heater is active on another tool.
         heaters_active_with_other_tool: list[str] = []
         invalid_tools = (
-                self._tool,
-                self._tool._ktc.TOOL_NONE,
-                self._tool._ktc.TOOL_UNKNOWN,
+                tool,
+                ktc.TOOL_NONE,
+                ktc.TOOL_UNKNOWN,
                 None,
             )
-        for tool in self._tool._ktc.all_tools.values():
-            if tool not in invalid_tools:
-                if tool.extruder.state == HeaterStateType.ACTIVE:
-                    heaters_active_with_other_tool.extend(tool.extruder.heater_names())
+        for other_tool in ktc.all_tools.values():
+            if other_tool not in invalid_tools:
+                if other_tool.extruder.state == HeaterStateType.ACTIVE:
+                    heaters_active_with_other_tool.extend(other_tool.extruder.heater_names())
 
         for hs in self.heaters:
             if hs.name not in heaters_active_with_other_tool:
                 if value == HeaterStateType.STANDBY:
-                    self._tool._ktc.log.trace(
-                        f"Setting heater state to STANDBY for tool {self._tool.name}"
+                    log.trace(
+                        f"Setting heater state to STANDBY for tool {tool.name}"
                         + f" with heater {hs.name}"
                     )
                     set_heater_options(self, hs)
-                self._tool._ktc.all_heaters[hs.name].state = value
+                all_heaters[hs.name].state = value
             else:
                 # Can't track standby for tool if heater is in active state on another tool.
-                self._tool._ktc.log.trace(
-                    f"Tool {self._tool.name} has heater {hs.name} active on another tool. "
+                log.trace(
+                    f"Tool {tool.name} has heater {hs.name} active on another tool. "
                 )
-                self._tool._ktc.log.track_heater_active_end(self._tool)
-                self._tool._ktc.log.track_heater_standby_end(self._tool)
+                log.track_heater_active_end(tool)
+                log.track_heater_standby_end(tool)
                 self._state = HeaterStateType.OFF
 
     @property
@@ -464,6 +479,9 @@ class KtcHeaterTimer:
         self.duration = float(duration)
         if self.inside_timer:
             self.repeat = self.duration != 0.0
+        elif not self.duration and not self.counting_down:
+            # Already idle, the reactor timer is parked at NEVER.
+            return
         else:
             waketime = self.reactor.NEVER
             if self.duration:
@@ -613,7 +613,7 @@ class KtcLog:
 
     def track_heater_active_end_for_tools_having_heater(self, heater: 'ktc_heater.KtcHeater'):
         for tool in self._ktc.all_tools.values():
-            if tool not in self._ktc.INVALID_TOOLS:
+            if id(tool) not in self._ktc.INVALID_TOOL_IDS:
                 # self.debug(
                 #     "track_heater_active_end_for_tools_having_heater: "
                 #     + f"Heater: {heater.name}: Tool: {tool.name} .start_time_heater_active: "
@@ -651,7 +651,7 @@ class KtcLog:
         self, heater: 'ktc_heater.KtcHeater'):
         '''Called by the HeaterTimer when the heater is set to standby.'''
         for tool in self._ktc.all_tools.values():
-            if tool not in self._ktc.INVALID_TOOLS:
+            if id(tool) not in self._ktc.INVALID_TOOL_IDS:
                 # self.debug(
                 #     "track_heater_standby_start_for_standby_tools_having_heater: "
                 #     + f"Tool: {tool.name} .extruder.state: {tool.extruder.state}")
@@ -673,7 +673,7 @@ class KtcLog:
     def track_heater_end_for_tools_having_heater(self, heater: 'ktc_heater.KtcHeater'):
         '''Called by the HeaterTimer when the heater is set to off.'''
         for tool in self._ktc.all_tools.values():
-            if tool not in self._ktc.INVALID_TOOLS:
+            if id(tool) not in self._ktc.INVALID_TOOL_IDS:
                 if self.tool_stats[tool.name].start_time_heater_standby:
                     if heater.name in tool.extruder.heater_names():
                         if self.tool_stats[tool.name].start_time_heater_standby:
@@ -20,6 +20,9 @@ if typing.TYPE_CHECKING:
     from ...klipper.klippy.extras import gcode_macro as klippy_gcode_macro
     from . import ktc_toolchanger
 
+# Translation table removing all whitespace, including line breaks, from the heater option.
+_WHITESPACE_DELETE = str.maketrans("", "", " \t\r\n")
+
 class KtcTool(KtcBaseToolClass, KtcConstantsClass):
     """Class for a single tool in the toolchanger"""
 
@@ -37,14 +40,20 @@ class KtcTool(KtcBaseToolClass, KtcConstantsClass):
         # Will be added to the ktc.tools_by_number dict in ktc._config_tools()
         self.number = config.getint("tool_number", None)  # type: ignore
 
+        # Compiled tool_select_gcode and tool_deselect_gcode. Set in configure_inherited_params.
+        self._tool_select_gcode_template: klippy_gcode_macro.TemplateWrapper = None   # type: ignore
+        self._tool_deselect_gcode_template: klippy_gcode_macro.TemplateWrapper = None # type: ignore
+        # Part of get_status that doesn't change after configure_inherited_params.
+        self._static_status: dict = {}
+        # SET_FAN_SPEED command prefix and speed factor per fan. Set in configure_inherited_params.
+        self._fan_speed_cmds: list[tuple[str, float]] = []
+
         ##### Toolchanger #####
         # If none, then the default toolchanger will be set in ktc._config_default_toolchanger()
         toolchanger_name = config.get("toolchanger", None)  # type: ignore # None is default.
         if toolchanger_name is not None:
-            self.toolchanger = typing.cast(  # type: ignore
-                "ktc_toolchanger.KtcToolchanger",
-                self.printer.load_object(config, "ktc_toolchanger " + toolchanger_name),
-            )
+            self.toolchanger = self.printer.load_object(  # type: ignore
+                config, "ktc_toolchanger " + toolchanger_name)
 
     @property
     def toolchanger(self) -> "ktc_toolchanger.KtcToolchanger":
@@ -67,14 +76,20 @@ class KtcTool(KtcBaseToolClass, KtcConstantsClass):
 
         super().configure_inherited_params()
 
-        self.gcode_macro = typing.cast('klippy_gcode_macro.PrinterGCodeMacro', # type: ignore # pylint: disable=attribute-defined-outside-init
-                                  self.printer.lookup_object("gcode_macro"))    # type: ignore
+        self.gcode_macro: 'klippy_gcode_macro.PrinterGCodeMacro' = (    # pylint: disable=attribute-defined-outside-init
+            self.printer.lookup_object("gcode_macro"))    # type: ignore
+
+        # Compile the templates once instead of on every select and deselect.
+        self._tool_select_gcode_template = self.gcode_macro.load_template(
+            self.config, "", self._tool_select_gcode)
+        self._tool_deselect_gcode_template = self.gcode_macro.load_template(
+            self.config, "", self._tool_deselect_gcode)
 
         self.extruder.active_to_standby_delay = self._heater_active_to_standby_delay_in_config
         self.extruder.standby_to_powerdown_delay = self._heater_standby_to_powerdown_delay_in_config
         # Settings for any heaters.
-        if self._heaters_config is not None:
-            heaters = self._heaters_config.replace(" ", "").split(",")
+        if self._heaters_config:
+            heaters = self._heaters_config.translate(_WHITESPACE_DELETE).split(",")
             for heater_string in heaters:
                 if heater_string == "":
                     continue
@@ -87,10 +102,20 @@ class KtcTool(KtcBaseToolClass, KtcConstantsClass):
                         self.config, "ktc_heater " + heater_settings.name)
                     )
 
+        self._fan_speed_cmds = [
+            (f"SET_FAN_SPEED FAN={name} SPEED=", speed) for name, speed in self.fans]
+
+        self._static_status = {
+            "fans": self.fans,
+            "heater_names": self.extruder.heater_names(),
+            "params_available": str(self.params.keys()),
+            **self.params,
+        }
+
         self.state = self.StateType.CONFIGURED
 
     def cmd_SelectTool(self, gcmd): # pylint: disable=invalid-name, unused-argument
-        self.log.trace("KTC Tool " + str(self.number) + " Selected.")
+        self.log.trace(f"KTC Tool {self.number} Selected.")
         self.run_with_profile(self.select, final_selected=True)
 
     def select(self, final_selected=False):
@@ -117,7 +142,7 @@ class KtcTool(KtcBaseToolClass, KtcConstantsClass):
 
                 # If the new tool to be selected has any heaters prepare warmup before
                 # actual tool change so all moves will be done while heating up.
-                if len(self.extruder.heaters) > 0:
+                if self.extruder.heaters:
                     self.set_heaters(heater_state=HeaterStateType.ACTIVE)
 
                 # Put all other active heaters in standby.
@@ -151,7 +176,7 @@ class KtcTool(KtcBaseToolClass, KtcConstantsClass):
                             t.select()
 
             # If already selected then do nothing.
-            if self.state == self.StateType.SELECTED or self.state == self.StateType.ACTIVE:
+            if self.state is self._ST_SELECTED or self.state is self._ST_ACTIVE:
                 return
 
             # Now we asume tool has been dropped if needed be.
@@ -165,8 +190,7 @@ class KtcTool(KtcBaseToolClass, KtcConstantsClass):
                 self.state = self.StateType.SELECTING
                 self.toolchanger.state = self.toolchanger.StateType.CHANGING
                 self._ktc.state = self.StateType.CHANGING
-                tool_select_gcode_template = self.gcode_macro.load_template(
-                    self.config, "", self._tool_select_gcode)
+                tool_select_gcode_template = self._tool_select_gcode_template
                 context = tool_select_gcode_template.create_template_context()
                 context['myself'] = self.get_status()
                 context['ktc'] = self._ktc.get_status()
@@ -175,27 +199,23 @@ class KtcTool(KtcBaseToolClass, KtcConstantsClass):
                 # Check that the gcode has changed the state.
             except Exception as e:
                 raise Exception("Failed to run tool_select_gcode: " + str(e)) from e
-            if self.state == self.StateType.SELECTING:
+            if self.state is self._ST_SELECTING:
                 raise self.config.error(
                     ("tool_select_gcode has not changed the state while running "
                     + "code in tool_select_gcode. Use for example "
                     + "'KTC_TOOL_SET_STATE TOOL={myself.name} STATE=SELECTED' to "
                     + "indicate it is selected successfully. Or ERROR if it failed.")
                 )
-            elif self.state == self.StateType.ERROR:
+            elif self.state is self._ST_ERROR:
                 raise self.config.error(
                     ("tool_select_gcode changed the state to ERROR while running.")
                 )
 
-            if final_selected and self.state == self.StateType.SELECTED:
+            if final_selected and self.state is self._ST_SELECTED:
                 # Restore fan if has a fan.
-                for fan in self.fans:
-                    self.gcode.run_script_from_command(
-                        "SET_FAN_SPEED FAN="
-                        + fan[0]
-                        + " SPEED="
-                        + str(self._ktc.saved_fan_speed * float(fan[1]))
-                    )
+                saved_fan_speed = self._ktc.saved_fan_speed
+                for fan_cmd, speed in self._fan_speed_cmds:
+                    self.gcode.run_script_from_command(fan_cmd + str(saved_fan_speed * speed))
 
                 self._ktc.active_tool = self
                 self.log.track_tool_selected_start(self)
@@ -232,7 +252,7 @@ class KtcTool(KtcBaseToolClass, KtcConstantsClass):
             if (
                 self.toolchanger.parent_tool is not None and
                 self.parent_must_be_selected_on_deselect and
-                self.toolchanger.parent_tool.state != self.StateType.SELECTED
+                self.toolchanger.parent_tool.state is not self._ST_SELECTED
                 ):
                 tools_to_select = self._get_list_from_tool_traversal_conditional(
                     self, "parent_must_be_selected_on_deselect", True)
@@ -240,8 +260,7 @@ class KtcTool(KtcBaseToolClass, KtcConstantsClass):
                     t.select()
 
             try:
-                gcode_template = self.gcode_macro.load_template(
-                    self.config, "", self._tool_deselect_gcode)
+                gcode_template = self._tool_deselect_gcode_template
                 context = gcode_template.create_template_context()
                 context['myself'] = self.get_status()
                 context['ktc'] = self._ktc.get_status()
@@ -250,14 +269,14 @@ class KtcTool(KtcBaseToolClass, KtcConstantsClass):
             except Exception as e:
                 raise Exception("Failed to run tool_deselect_gcode: " + str(e)) from e
             # Check that the gcode has changed the state.
-            if self.state == self.StateType.DESELECTING:
+            if self.state is self._ST_DESELECTING:
                 raise self.config.error(
                     ("tool_deselect_gcode has not changed the state while running "
                     + "code in tool_select_gcode. Use for example "
                     + "'KTC_TOOL_SET_STATE TOOL={myself.name} STATE=SELECTED' to "
                     + "indicate it is selected successfully. Or ERROR if it failed.")
                 )
-            elif self.state == self.StateType.ERROR:
+            elif self.state is self._ST_ERROR:
                 raise self.config.error(
                     ("tool_select_gcode has changed the state to ERROR while running.")
                 )
@@ -275,29 +294,21 @@ class KtcTool(KtcBaseToolClass, KtcConstantsClass):
     def _get_list_from_tool_traversal_conditional(
         self, start_tool: KtcBaseToolClass, param: str,
         value, condition = operator.eq) -> typing.List[KtcTool]:
+        """Return the tools from start_tool up through the parent tools
+        where condition(tool.param, value) is True."""
         return_list = []
+        stop_at = (self.TOOL_NONE, self.TOOL_UNKNOWN, self._ktc, None)
 
-        if start_tool in (
-            self.TOOL_NONE,
-            self.TOOL_UNKNOWN,
-            self._ktc,
-            None
-        ):
-            return return_list
-
-        if condition(getattr(start_tool, param), value):
-            return_list.append(start_tool)
-
-        upper_tool = start_tool.toolchanger.parent_tool
-
-        if upper_tool is not None:
-            return_list += self._get_list_from_tool_traversal_conditional(
-                upper_tool, param, value, condition)
+        tool = start_tool
+        while tool not in stop_at:
+            if condition(getattr(tool, param), value):
+                return_list.append(tool)
+            tool = tool.toolchanger.parent_tool
 
         return return_list
 
     def set_heaters(self, **kwargs) -> None:
-        if len(self.extruder.heaters) < 1:
+        if not self.extruder.heaters:
             self.log.debug(
                 "set_heater: KTC Tool %s has no heaters! Nothing to do." % self.name
             )
@@ -310,10 +321,6 @@ class KtcTool(KtcBaseToolClass, KtcConstantsClass):
         changing_timer = False
         ex = self.extruder
 
-        if self in self.INVALID_TOOLS:
-            self.log.always("KTC Tool %s is not a valid tool to set heaters for." % self.name)
-            return
-
         for i in kwargs:    # pylint: disable=consider-using-dict-items
             if i == "heater_active_temp":
                 ex.active_temp = kwargs[i]
@@ -349,16 +356,13 @@ class KtcTool(KtcBaseToolClass, KtcConstantsClass):
             "number": self.number,
             "state": self.state,
             "toolchanger": self.toolchanger.name,
-            "fans": self.fans,
             "offset": [self.offset[i] + self._ktc.global_offset[i] for i in range(3)],
-            "heater_names": [heater.name for heater in self.extruder.heaters],
             "heater_state": self.extruder.state,
             "heater_active_temp": self.extruder.active_temp,
             "heater_standby_temp": self.extruder.standby_temp,
             "heater_active_to_standby_delay": self.extruder.active_to_standby_delay,
             "standby_to_powerdown_delay": self.extruder.standby_to_powerdown_delay,
-            "params_available": str(self.params.keys()),
-            **self.params,
+            **self._static_status,
         }
         return status
 
@@ -64,8 +64,8 @@ class KtcToolchanger(KtcBaseChangerClass, KtcConstantsClass):
 
     def configure_inherited_params(self):
         super().configure_inherited_params()
-        self.gcode_macro = typing.cast('klippy_gcode_macro.PrinterGCodeMacro', # type: ignore # pylint: disable=attribute-defined-outside-init
-                                  self.printer.lookup_object("gcode_macro"))    # type: ignore
+        self.gcode_macro: 'klippy_gcode_macro.PrinterGCodeMacro' = (    # pylint: disable=attribute-defined-outside-init
+            self.printer.lookup_object("gcode_macro"))    # type: ignore
         self.state = self.StateType.CONFIGURED  # pylint: disable=attribute-defined-outside-init # pylint bug
 
     def initialize(self):